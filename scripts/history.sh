@@ -0,0 +1,15 @@
+#!/bin/bash
+
+source venv/bin/activate
+
+source .env
+
+# Pass the arguments to the history CLI (e.g. `export ./data/history.jsonl.gz` or `import ./data/history.jsonl.gz`)
+python3 -m src.history "$@"
+status=$?
+
+# Deactivate the virtual environment
+deactivate
+
+# Exit the script with the status of the CLI
+exit $status
@@ -1,6 +1,7 @@
 from telebot.types import BotCommand, BotCommandScopeDefault, Message
 
 from src.commands.clear import clear_command_handler
+from src.commands.diagnostics import diagnostics_command_handler
 from src.commands.help import help_command_handler
 from src.commands.message import text_message_handler
 from src.config import config
@@ -34,6 +35,12 @@ async def clear_command(msg: Message):
     return result
 
 
+@config.BOT.message_handler(commands=["diagnostics"])
+async def diagnostics_command(msg: Message):
+    result = await diagnostics_command_handler(msg)
+    return result
+
+
 @config.BOT.message_handler(content_types=["text"])
 async def text_message(msg: Message):
     result = await text_message_handler(msg)
@@ -0,0 +1,56 @@
+from telebot.types import Message
+
+from src.config import config
+from src.utils.diagnostics import parse_profile_duration
+from src.utils.markdown import MAX_MESSAGE_LENGTH
+
+DIAGNOSTICS_USAGE = """Usage:
+/diagnostics memory - Start memory tracing, or show the top allocations if it's already started
+/diagnostics memory stop - Stop memory tracing
+/diagnostics gc - Show garbage collection pauses
+/diagnostics models - Show the health and latency of the model backends
+/diagnostics profile [seconds] - Profile the CPU usage of the event loop (5s by default, 60s max)"""
+
+
+async def diagnostics_command_handler(message: Message):
+    """
+    Send diagnostics about the bot process (memory, garbage collection or CPU profile) to an admin.
+    """
+    # Log the command
+    span = config.LOGGER.get_span(message)
+    span.info("/diagnostics command called")
+    try:
+        if (
+            config.DIAGNOSTICS is None
+            or message.from_user is None
+            or message.from_user.id not in config.ADMIN_USER_IDS
+        ):
+            span.warn(
+                "/diagnostics command ignored: not an admin or diagnostics disabled"
+            )
+            return None
+
+        args = (message.text or "").split()[1:]
+        report = args[0] if len(args) > 0 else ""
+        if report == "memory" and args[1:] == ["stop"]:
+            config.DIAGNOSTICS.stop_memory_tracing()
+            result = "Memory tracing stopped"
+        elif report == "memory":
+            result = await config.DIAGNOSTICS.get_memory_report()
+        elif report == "gc":
+            result = config.DIAGNOSTICS.get_gc_report()
+        elif report == "models":
+            result = config.AGENT.get_stats_report()
+        elif report == "profile" and (duration := parse_profile_duration(args[1:])):
+            await config.BOT.reply_to(message, f"Profiling for {duration}s...")
+            result = await config.DIAGNOSTICS.get_profile_report(duration)
+        else:
+            result = DIAGNOSTICS_USAGE
+
+        # Send the report in a code block, truncated to fit in a single message
+        max_length = MAX_MESSAGE_LENGTH - len("```\n```")
+        await config.BOT.reply_to(message, f"```\n{result[:max_length]}```")
+    except Exception as e:
+        span.error(f"Error handling /diagnostics command: {e}")
+    finally:
+        return None
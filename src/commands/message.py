@@ -3,9 +3,12 @@ from libertai_agents.interfaces.messages import Message as LibertaiMessage
 from libertai_agents.interfaces.messages import MessageRoleEnum
 
 from src.config import config
+from src.utils.markdown import MarkdownRenderer
 from src.utils.telegram import (
+    edit_rendered_replies,
     get_formatted_message_content,
     get_formatted_username,
+    replace_replies_with_error,
     should_reply_to_message,
 )
 
@@ -22,7 +25,8 @@ async def text_message_handler(message: telebot_types.Message):
     span = config.LOGGER.get_span(message)
     span.info("Received text message")
 
-    reply: telebot_types.Message | None
+    # Replies sent for the answer, the first one being edited and the others added when it's too long
+    replies: list[telebot_types.Message] = []
 
     try:
         chat_id = message.chat.id
@@ -37,7 +41,8 @@ async def text_message_handler(message: telebot_types.Message):
         # Send an initial response
         # TODO: select a phrase randomly from a list to get a more dynamic result
         result = "I'm thinking..."
-        reply = await config.BOT.reply_to(message, result)
+        replies.append(await config.BOT.reply_to(message, result))
+        replies_text = [result]
 
         messages: list[LibertaiMessage] = []
 
@@ -56,32 +61,39 @@ async def text_message_handler(message: telebot_types.Message):
             )
             messages.append(LibertaiMessage(role=role, content=message_content))
 
+        renderer = MarkdownRenderer()
         # TODO: pass system prompt with chat details
         async for response_msg in config.AGENT.generate_answer(
             messages,
             system_prompt="You are a helpful assistant. If the first line of a message contains something like 'username (in reply to other_user)', it's an information useful for you, but you should not reproduce this in your answer, just respond with your answer.",
         ):
             if response_msg.content != result:
+                # Only show the previous answer now that we know it's not the final one, the final answer
+                # (often the only one) being rendered once complete to avoid editing the replies twice
+                if renderer.text != "":
+                    await edit_rendered_replies(
+                        message, replies, replies_text, renderer.render()
+                    )
                 result = response_msg.content
-                # Update the message
-                reply = await config.BOT.edit_message_text(
-                    chat_id=chat_id, message_id=reply.message_id, text=result
-                )
+                renderer.update(result)
+
+        # Escape the Markdown entities that were never closed
+        renderer.finish()
+        await edit_rendered_replies(message, replies, replies_text, renderer.render())
 
     except Exception as e:
         span.error(f"Error handling text message: {e}")
         # Attempt to edit the message to indicate an error
 
-        if reply is not None:
-            reply = await config.BOT.edit_message_text(
-                chat_id=message.chat.id,
-                message_id=reply.message_id,
-                text="I'm sorry, I got confused. Please try again.",
-            )
+        await replace_replies_with_error(
+            message, replies, "I'm sorry, I got confused. Please try again."
+        )
     finally:
         # Attempt to update the message history to reflect the final response
-        if reply is not None:
+        for sent_reply in replies:
             await config.DATABASE.add_message(
-                reply, use_edit_date=True, reply_to_message_id=message.message_id
+                sent_reply,
+                use_edit_date=sent_reply.edit_date is not None,
+                reply_to_message_id=message.message_id,
             )
         return None
@@ -1,15 +1,15 @@
 import os
 
 from dotenv import load_dotenv
-from libertai_agents.agents import ChatAgent
-from libertai_agents.models import get_model
 from telebot import async_telebot
 from telebot.async_telebot import AsyncTeleBot
 from telebot.types import User
 
 from src.tools import tools
 from src.utils.database import AsyncDatabase
+from src.utils.diagnostics import Diagnostics
 from src.utils.logger import Logger
+from src.utils.router import ModelBackend, ModelRouter
 
 
 class _Config:
@@ -17,7 +17,9 @@ class _Config:
     LOGGER: Logger
     BOT: AsyncTeleBot
     DATABASE: AsyncDatabase
-    AGENT: ChatAgent
+    AGENT: ModelRouter
+    ADMIN_USER_IDS: list[int]
+    DIAGNOSTICS: Diagnostics | None
 
     # Data that will be set at the beginning of the agent loop and shouldn't be used before
     BOT_INFO: User
@@ -48,10 +50,35 @@ class _Config:
 
             # LibertAI Agent
             self.LOGGER.info("Setting up agent...")
-            self.AGENT = ChatAgent(
-                model=get_model("NousResearch/Hermes-3-Llama-3.1-8B"),
-                tools=tools,
-                expose_api=False,
+            agent_models = os.getenv(
+                "AGENT_MODELS", "NousResearch/Hermes-3-Llama-3.1-8B"
+            ).split(",")
+            self.AGENT = ModelRouter(
+                backends=[
+                    ModelBackend.from_spec(spec, tools)
+                    for spec in agent_models
+                    if spec.strip() != ""
+                ],
+                hedge_delay=float(os.getenv("AGENT_HEDGE_DELAY", "10")),
+                logger=self.LOGGER,
+            )
+
+            # Diagnostics, started with the event loop and only available to admins
+            self.LOGGER.info("Setting up diagnostics...")
+            self.ADMIN_USER_IDS = [
+                int(user_id)
+                for user_id in os.getenv("ADMIN_USER_IDS", "").split(",")
+                if user_id.strip() != ""
+            ]
+            self.DIAGNOSTICS = (
+                Diagnostics(
+                    self.LOGGER,
+                    slow_callback_threshold=float(
+                        os.getenv("SLOW_CALLBACK_THRESHOLD", "0.1")
+                    ),
+                )
+                if os.getenv("DIAGNOSTICS", "False") == "True"
+                else None
             )
         except Exception as e:
             self.LOGGER.error(f"An unexpected error occurred during setup: {e}")
@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+from src.utils.database import AsyncDatabase
+from src.utils.logger import Logger
+
+# Number of rows between two progress reports
+PROGRESS_INTERVAL = 100_000
+
+
+class _Progress:
+    """
+    Track the number of rows processed and periodically log the throughput
+    """
+
+    def __init__(self, logger: Logger, action: str):
+        self.logger = logger
+        self.action = action
+        self.rows = 0
+        # Rows actually written when some can be skipped, None if they are all written
+        self.written: int | None = None
+        self.started_at = time.monotonic()
+        self._next_report = PROGRESS_INTERVAL
+
+    def add(self, rows: int, written: int | None = None):
+        self.rows += rows
+        if written is not None:
+            self.written = (self.written or 0) + written
+        if self.rows >= self._next_report:
+            self._next_report += PROGRESS_INTERVAL
+            self.report()
+
+    def report(self):
+        elapsed = time.monotonic() - self.started_at
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        if self.written is None:
+            summary = f"{self.rows} messages"
+        else:
+            summary = (
+                f"{self.written} messages ({self.rows - self.written} already present)"
+            )
+        self.logger.info(
+            f"{self.action} {summary} in {elapsed:.1f}s ({rate:.0f} rows/s)"
+        )
+
+
+async def export_history(
+    database: AsyncDatabase,
+    output_path: str,
+    batch_size: int,
+    chat_ids: list[int] | None,
+    since: datetime.datetime | None,
+    until: datetime.datetime | None,
+    logger: Logger,
+):
+    """
+    Export the messages to a gzip-compressed JSONL file, one message with its author per line
+    """
+    progress = _Progress(logger, "Exported")
+    with gzip.open(output_path, "wt", encoding="utf-8") as output:
+        async for rows in database.get_messages_batches(
+            batch_size, chat_ids=chat_ids, since=since, until=until
+        ):
+            for row in rows:
+                line = {
+                    "id": row["id"],
+                    "chat_id": row["chat_id"],
+                    "reply_to_message_id": row["reply_to_message_id"],
+                    "text": row["text"],
+                    "timestamp": row["timestamp"].isoformat()
+                    if row["timestamp"] is not None
+                    else None,
+                    "from_user_id": row["from_user_id"],
+                    # None if the author is missing from the users table
+                    "from_user": {
+                        "id": row["from_user_row_id"],
+                        "username": row["from_user_username"],
+                        "first_name": row["from_user_first_name"],
+                        "last_name": row["from_user_last_name"],
+                        "language_code": row["from_user_language_code"],
+                    }
+                    if row["from_user_row_id"] is not None
+                    else None,
+                }
+                output.write(json.dumps(line, ensure_ascii=False) + "\n")
+            progress.add(len(rows))
+    progress.report()
+
+
+async def import_history(
+    database: AsyncDatabase, input_path: str, batch_size: int, logger: Logger
+):
+    """
+    Import messages from a file created by `export_history`, skipping the ones already in the database
+    """
+    progress = _Progress(logger, "Imported")
+    users: dict[int, dict] = {}
+    messages: list[dict] = []
+
+    async def flush():
+        inserted = await database.add_messages_batch(list(users.values()), messages)
+        progress.add(len(messages), inserted)
+        users.clear()
+        messages.clear()
+
+    with gzip.open(input_path, "rt", encoding="utf-8") as input_file:
+        for line in input_file:
+            if line.strip() == "":
+                continue
+            data = json.loads(line)
+            from_user = data.pop("from_user")
+            if from_user is not None:
+                users[from_user["id"]] = from_user
+            if data["timestamp"] is not None:
+                data["timestamp"] = datetime.datetime.fromisoformat(data["timestamp"])
+            messages.append(data)
+
+            if len(messages) >= batch_size:
+                await flush()
+    await flush()
+    progress.report()
+
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Export or import the chat history stored in the database"
+    )
+    database_path = os.getenv("DATABASE_PATH")
+    parser.add_argument(
+        "--database",
+        default=database_path,
+        # Required without DATABASE_PATH, as an in-memory database would be empty and lost once done
+        required=database_path is None,
+        help="Path to the SQLite database (defaults to DATABASE_PATH)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=5000,
+        help="Number of messages read or written at once",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser(
+        "export", help="Export messages to a gzip-compressed JSONL file"
+    )
+    export_parser.add_argument("output", help="Path of the .jsonl.gz file to create")
+    export_parser.add_argument(
+        "--chat-id",
+        type=int,
+        action="append",
+        dest="chat_ids",
+        help="Only export the messages of this chat (can be repeated)",
+    )
+    export_parser.add_argument(
+        "--since",
+        type=datetime.datetime.fromisoformat,
+        help="Only export the messages sent at this date or after (ISO format)",
+    )
+    export_parser.add_argument(
+        "--until",
+        type=datetime.datetime.fromisoformat,
+        help="Only export the messages sent before this date (ISO format)",
+    )
+
+    import_parser = subparsers.add_parser(
+        "import", help="Import messages from a gzip-compressed JSONL file"
+    )
+    import_parser.add_argument("input", help="Path of the .jsonl.gz file to import")
+
+    args = parser.parse_args()
+    if args.database == ":memory:":
+        parser.error("an in-memory database can't be exported or imported")
+
+    logger = Logger()
+    database = AsyncDatabase(args.database)
+    if args.command == "export":
+        asyncio.run(
+            export_history(
+                database,
+                args.output,
+                args.batch_size,
+                args.chat_ids,
+                args.since,
+                args.until,
+                logger,
+            )
+        )
+    else:
+        asyncio.run(import_history(database, args.input, args.batch_size, logger))
+
+
+if __name__ == "__main__":
+    main()
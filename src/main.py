@@ -7,6 +7,10 @@ from src.config import config
 async def main():
     config.LOGGER.info("Starting bot...")
     try:
+        if config.DIAGNOSTICS is not None:
+            config.DIAGNOSTICS.start()
+            config.LOGGER.info("Diagnostics started")
+
         # Get the bot's username
         bot_info = await config.BOT.get_me()
         config.BOT_INFO = bot_info
@@ -19,6 +23,8 @@ async def main():
         config.LOGGER.error(f"An unexpected error occurred: {e}")
     finally:
         config.LOGGER.info("Stopping bot...")
+        if config.DIAGNOSTICS is not None:
+            config.DIAGNOSTICS.stop()
 
 
 if __name__ == "__main__":
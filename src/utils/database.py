@@ -1,15 +1,19 @@
 import asyncio
 import datetime
+from typing import AsyncIterable, cast
 
 from sqlalchemy import (
     Column,
+    CursorResult,
     DateTime,
     ForeignKey,
     Integer,
+    Select,
     String,
     delete,
     select,
 )
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import joinedload, relationship
@@ -195,3 +199,82 @@ class AsyncDatabase:
                     f"AsyncDatabase::clear_chat_history(): Error clearing chat history: {e}"
                 )
             raise e
+
+    async def get_messages_batches(
+        self,
+        batch_size: int = 1000,
+        chat_ids: list[int] | None = None,
+        since: datetime.datetime | None = None,
+        until: datetime.datetime | None = None,
+    ) -> AsyncIterable[list[dict]]:
+        """
+        Get all the messages with their author in batches ordered by ID.
+        Keyset pagination is used so that every batch is as fast to get as the first one, whatever the number of messages
+
+        batch_size: The maximum number of messages in a batch
+        chat_ids: Only get the messages of these chats. If None, messages from all the chats are returned
+        since: Only get the messages sent at this date or after
+        until: Only get the messages sent before this date
+        """
+        query: Select = (
+            select(
+                Message.id,
+                Message.chat_id,
+                Message.reply_to_message_id,
+                Message.text,
+                Message.timestamp,
+                Message.from_user_id,
+                # Only set when the author of the message is in the users table
+                User.id.label("from_user_row_id"),
+                User.username.label("from_user_username"),
+                User.first_name.label("from_user_first_name"),
+                User.last_name.label("from_user_last_name"),
+                User.language_code.label("from_user_language_code"),
+            )
+            .outerjoin(User, Message.from_user_id == User.id)
+            .order_by(Message.id)
+            .limit(batch_size)
+        )
+        if chat_ids is not None:
+            query = query.where(Message.chat_id.in_(chat_ids))
+        if since is not None:
+            query = query.where(Message.timestamp >= since)
+        if until is not None:
+            query = query.where(Message.timestamp < until)
+
+        last_id: int | None = None
+        while True:
+            async with self.async_session() as session:
+                result = await session.execute(
+                    query if last_id is None else query.where(Message.id > last_id)
+                )
+                rows = [dict(row._mapping) for row in result]
+            if len(rows) == 0:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    async def add_messages_batch(self, users: list[dict], messages: list[dict]) -> int:
+        """
+        Add messages and their authors to the database in a single transaction, skipping the ones already present.
+        Returns the number of messages actually inserted
+
+        users: The users to add, with the columns of the users table as keys
+        messages: The messages to add, with the columns of the messages table as keys
+        """
+        async with self.async_session() as session:
+            async with session.begin():
+                if len(users) > 0:
+                    await session.execute(
+                        insert(User.__table__).on_conflict_do_nothing(), users
+                    )
+                if len(messages) == 0:
+                    return 0
+                # Rows skipped by the conflict clause aren't counted
+                result = cast(
+                    CursorResult,
+                    await session.execute(
+                        insert(Message.__table__).on_conflict_do_nothing(), messages
+                    ),
+                )
+                return result.rowcount
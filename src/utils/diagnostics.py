@@ -0,0 +1,277 @@
+import asyncio
+import gc
+import math
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+from types import FrameType
+
+from src.utils.logger import Logger
+
+DEFAULT_PROFILE_DURATION = 5.0
+MAX_PROFILE_DURATION = 60.0
+
+
+def parse_profile_duration(args: list[str]) -> float | None:
+    """
+    Get the profile duration from the command arguments, or None if it's invalid
+
+    args: The arguments following the "profile" report name
+    """
+    if len(args) == 0:
+        return DEFAULT_PROFILE_DURATION
+    try:
+        duration = float(args[0])
+    except ValueError:
+        return None
+    # Also rejects nan and infinity
+    if not math.isfinite(duration) or not 0 < duration <= MAX_PROFILE_DURATION:
+        return None
+    return duration
+
+
+class Diagnostics:
+    """
+    Opt-in profiling hooks to investigate slowdowns in production:
+    - a watchdog logging the stack trace of the code blocking the event loop for longer than a threshold
+    - tracemalloc snapshots of the top memory allocations and their growth (tracing is started on demand as it slows
+      down allocations)
+    - garbage collection pause statistics
+    - an on-demand sampling CPU profiler of the event loop thread
+    """
+
+    logger: Logger
+    slow_callback_threshold: float
+    tracemalloc_frames: int
+
+    def __init__(
+        self,
+        logger: Logger,
+        slow_callback_threshold: float = 0.1,
+        tracemalloc_frames: int = 1,
+    ):
+        """
+        Initialize a new Diagnostics instance
+        - logger - where to log the event loop stalls
+        - slow_callback_threshold - seconds the event loop can be blocked before logging a stack trace
+        - tracemalloc_frames - number of frames stored by tracemalloc for each allocation (more frames cost more memory and CPU)
+        """
+        if not slow_callback_threshold > 0:
+            # The heartbeat and the watchdog would otherwise run in a busy loop (also rejects nan)
+            raise ValueError("The slow callback threshold must be positive")
+        self.logger = logger
+        self.slow_callback_threshold = slow_callback_threshold
+        self.tracemalloc_frames = tracemalloc_frames
+
+        self._loop_thread_id: int | None = None
+        self._last_heartbeat = 0.0
+        self._heartbeat_task: asyncio.Task | None = None
+        self._watchdog_thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._profile_lock = asyncio.Lock()
+        self._last_snapshot: tracemalloc.Snapshot | None = None
+
+        # Garbage collection pauses stats, by generation
+        self._gc_started_at = 0.0
+        self._gc_collections: Counter[int] = Counter()
+        self._gc_pause_total: dict[int, float] = {}
+        self._gc_pause_max: dict[int, float] = {}
+
+    def start(self):
+        """
+        Start the diagnostics, must be called from the event loop to watch
+        """
+        self._loop_thread_id = threading.get_ident()
+        self._last_heartbeat = time.monotonic()
+        self._stopped.clear()
+
+        gc.callbacks.append(self._on_gc)
+
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog_thread = threading.Thread(
+            target=self._watch_event_loop, name="diagnostics-watchdog", daemon=True
+        )
+        self._watchdog_thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        self.stop_memory_tracing()
+
+    @property
+    def _heartbeat_interval(self) -> float:
+        return self.slow_callback_threshold / 2
+
+    async def _heartbeat(self):
+        while True:
+            self._last_heartbeat = time.monotonic()
+            await asyncio.sleep(self._heartbeat_interval)
+
+    def _watch_event_loop(self):
+        """
+        Run in a separate thread to detect when the heartbeat of the event loop stops
+        """
+        reported_heartbeat: float | None = None
+        while not self._stopped.wait(self._heartbeat_interval):
+            last_heartbeat = self._last_heartbeat
+            if reported_heartbeat is not None and last_heartbeat != reported_heartbeat:
+                # The event loop is running again
+                self.logger.warn(
+                    f"Diagnostics: event loop was blocked for {last_heartbeat - reported_heartbeat - self._heartbeat_interval:.3f}s"
+                )
+                reported_heartbeat = None
+
+            blocked_for = time.monotonic() - last_heartbeat - self._heartbeat_interval
+            if (
+                blocked_for < self.slow_callback_threshold
+                or last_heartbeat == reported_heartbeat
+            ):
+                continue
+            # Only report each stall once, with the stack of the code currently blocking the loop
+            reported_heartbeat = last_heartbeat
+            self.logger.warn(
+                f"Diagnostics: event loop blocked for more than {blocked_for:.3f}s, current stack:\n{self._get_loop_stack()}"
+            )
+
+    def _get_loop_stack(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id or 0)
+        if frame is None:
+            return "N/A"
+        return "".join(traceback.format_stack(frame))
+
+    def _on_gc(self, phase: str, info: dict):
+        if phase == "start":
+            self._gc_started_at = time.perf_counter()
+            return
+        generation = info["generation"]
+        pause = time.perf_counter() - self._gc_started_at
+        self._gc_collections[generation] += 1
+        self._gc_pause_total[generation] = (
+            self._gc_pause_total.get(generation, 0.0) + pause
+        )
+        self._gc_pause_max[generation] = max(
+            pause, self._gc_pause_max.get(generation, 0.0)
+        )
+
+    def get_gc_report(self) -> str:
+        """
+        Get the number of garbage collections and their pause durations for each generation
+        """
+        lines = [f"GC counts (allocations since last collection): {gc.get_count()}"]
+        for generation in sorted(self._gc_collections):
+            collections = self._gc_collections[generation]
+            total = self._gc_pause_total[generation]
+            lines.append(
+                f"Generation {generation}: {collections} collections, "
+                f"{total * 1000:.1f}ms total pause, {total / collections * 1000:.2f}ms average, "
+                f"{self._gc_pause_max[generation] * 1000:.2f}ms max"
+            )
+        return "\n".join(lines)
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+
+    async def get_memory_report(self, limit: int = 10) -> str:
+        """
+        Get the lines allocating the most memory, and the ones that grew the most since the previous report
+
+        limit: The number of lines to include in each ranking
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._last_snapshot = None
+            return "Memory tracing started, run the command again to get the top allocations since now"
+
+        # Taking a snapshot is slow, so it's done without blocking the event loop
+        snapshot = await asyncio.to_thread(self._take_snapshot)
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"Traced memory: {current / 1024 / 1024:.1f} MiB (peak {peak / 1024 / 1024:.1f} MiB)",
+            "",
+            f"Top {limit} allocations:",
+        ]
+        lines += [str(stat) for stat in snapshot.statistics("lineno")[:limit]]
+
+        if self._last_snapshot is not None:
+            lines += ["", f"Top {limit} growths since previous report:"]
+            lines += [
+                str(stat)
+                for stat in snapshot.compare_to(self._last_snapshot, "lineno")[:limit]
+            ]
+        self._last_snapshot = snapshot
+        return "\n".join(lines)
+
+    def stop_memory_tracing(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._last_snapshot = None
+
+    def _sample_event_loop(
+        self, duration: float, interval: float
+    ) -> tuple[int, Counter[str], Counter[str]]:
+        own_samples: Counter[str] = Counter()
+        total_samples: Counter[str] = Counter()
+        samples = 0
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            frame = sys._current_frames().get(self._loop_thread_id or 0)
+            if frame is not None:
+                samples += 1
+                code = frame.f_code
+                own_samples[f"{code.co_filename}:{frame.f_lineno} {code.co_name}"] += 1
+                # Walking the frames directly is much cheaper than extracting a full traceback
+                functions: set[str] = set()
+                current: FrameType | None = frame
+                while current is not None:
+                    functions.add(
+                        f"{current.f_code.co_filename} {current.f_code.co_name}"
+                    )
+                    current = current.f_back
+                # A function appearing several times in a stack (recursion) is only counted once
+                total_samples.update(functions)
+            time.sleep(interval)
+        return samples, own_samples, total_samples
+
+    async def get_profile_report(
+        self, duration: float = 5.0, interval: float = 0.005, limit: int = 15
+    ) -> str:
+        """
+        Profile the event loop thread by sampling its stack, and get the functions where most time was spent
+
+        duration: The number of seconds to profile for
+        interval: The number of seconds between two samples
+        limit: The number of functions to include in each ranking
+        """
+        if self._profile_lock.locked():
+            return "A profile is already running"
+
+        async with self._profile_lock:
+            samples, own_samples, total_samples = await asyncio.to_thread(
+                self._sample_event_loop, duration, interval
+            )
+        if samples == 0:
+            return "No samples collected"
+
+        lines = [f"{samples} samples over {duration}s", "", "Top self time:"]
+        lines += [
+            f"{count / samples:6.1%} {function}"
+            for function, count in own_samples.most_common(limit)
+        ]
+        lines += ["", "Top total time:"]
+        lines += [
+            f"{count / samples:6.1%} {function}"
+            for function, count in total_samples.most_common(limit)
+        ]
+        return "\n".join(lines)
@@ -0,0 +1,275 @@
+import bisect
+
+# Maximum number of characters in a Telegram message
+MAX_MESSAGE_LENGTH = 4096
+
+# Entities of Telegram's legacy Markdown parse mode (they can't be nested)
+BOLD = "*"
+ITALIC = "_"
+CODE = "`"
+PRE = "```"
+LINK_TEXT = "["
+LINK_URL = "]("
+
+# Characters that can be escaped with a backslash outside of entities
+ESCAPABLE_CHARACTERS = "_*`["
+
+
+class MarkdownRenderer:
+    """
+    Incrementally render an answer streamed in Markdown into valid Telegram messages.
+    Entities still open in a partial answer are automatically closed (and reopened in the next message when the answer
+    is too long to fit in a single one), so that every edit is accepted by Telegram.
+    """
+
+    text: str
+    max_length: int
+
+    def __init__(self, max_length: int = MAX_MESSAGE_LENGTH):
+        """
+        Initialize a new MarkdownRenderer instance
+        - max_length - the maximum number of characters in a rendered message
+        """
+        self.max_length = max_length
+        self.reset()
+
+    def reset(self):
+        self.text = ""
+        # Position of the next character to parse
+        self._position = 0
+        # Entity currently open and the position of its opening marker
+        self._entity: str | None = None
+        self._entity_start = 0
+        # Positions where the text can be cut, along with the entity open at this position
+        self._safe_positions: list[int] = [0]
+        self._safe_entities: list[str | None] = [None]
+        # Positions of the markers that never got closed and must be escaped
+        self._escapes: list[int] = []
+
+    def feed(self, chunk: str):
+        """
+        Add a new chunk of the answer
+
+        chunk: The text to append to the answer
+        """
+        self.text += chunk
+        self._parse(final=False)
+
+    def update(self, text: str):
+        """
+        Replace the answer with its latest full version, only parsing the new part if the previous one is a prefix
+
+        text: The full answer received so far
+        """
+        if not text.startswith(self.text):
+            self.reset()
+        self.feed(text[len(self.text) :])
+
+    def finish(self):
+        """
+        Mark the answer as complete, escaping the markers that were never closed
+        """
+        self._parse(final=True)
+
+    def render(self) -> list[str]:
+        """
+        Render the answer parsed so far into a list of messages, each of them being valid Markdown
+        """
+        messages: list[str] = []
+        start_index = 0
+        last_index = len(self._safe_positions) - 1
+        while start_index < last_index:
+            end_index = self._find_cut(start_index, last_index)
+            messages.append(self._render_range(start_index, end_index))
+            start_index = end_index
+        return messages
+
+    @property
+    def _max_link_length(self) -> int:
+        # A link is always at the beginning of a message when cut, but keep some room for the escaping
+        return max(self.max_length - len(PRE), 1)
+
+    def _mark_safe(self):
+        if self._entity in (LINK_TEXT, LINK_URL):
+            # Links can't be cut, they are only rendered once complete
+            return
+        if self._entity is not None and self._position <= self._entity_start + len(
+            self._entity
+        ):
+            # Don't cut right after an opening marker to avoid empty entities
+            return
+        if self._entity == PRE and self.text[self._position - 1] == "`":
+            # The closing marker added when cutting would be merged with the backtick
+            return
+        if self._position > self._safe_positions[-1]:
+            self._safe_positions.append(self._position)
+            self._safe_entities.append(self._entity)
+
+    def _open(self, marker: str):
+        self._entity = marker
+        self._entity_start = self._position
+        self._position += len(marker)
+
+    def _escape_entity(self):
+        # The opening marker was not an entity: escape it and parse again what follows as regular text
+        start = self._entity_start
+        self._escapes.append(start)
+        index = bisect.bisect_right(self._safe_positions, start)
+        del self._safe_positions[index:]
+        del self._safe_entities[index:]
+        self._entity = None
+        self._position = start + 1
+        self._mark_safe()
+
+    def _parse(self, final: bool):
+        while self._parse_available(final) and final and self._entity is not None:
+            self._escape_entity()
+
+    def _parse_available(self, final: bool) -> bool:
+        """
+        Parse as much of the text as possible, returning False when more text is needed to go further
+        """
+        while self._position < len(self.text):
+            if (
+                self._entity in (LINK_TEXT, LINK_URL)
+                and self._position - self._entity_start >= self._max_link_length
+            ):
+                # Links can't be cut, so one too long to fit in a message is sent as regular text
+                self._escape_entity()
+                continue
+
+            if self._entity is None:
+                parsed = self._parse_outside_entity(final)
+            elif self._entity == LINK_TEXT:
+                parsed = self._parse_link_text(final)
+            elif self._entity == LINK_URL:
+                if self.text[self._position] == ")":
+                    self._entity = None
+                self._position += 1
+                parsed = True
+            else:
+                parsed = self._parse_inside_entity(final)
+
+            if not parsed:
+                return False
+            self._mark_safe()
+        return True
+
+    def _parse_outside_entity(self, final: bool) -> bool:
+        char = self.text[self._position]
+        remaining = len(self.text) - self._position
+        if char == "\\":
+            if remaining < 2 and not final:
+                return False
+            escaped = (
+                remaining >= 2 and self.text[self._position + 1] in ESCAPABLE_CHARACTERS
+            )
+            self._position += 2 if escaped else 1
+        elif char == "`":
+            if remaining < len(PRE) and not final:
+                return False
+            self._open(PRE if self.text.startswith(PRE, self._position) else CODE)
+        elif char in (BOLD, ITALIC, LINK_TEXT):
+            self._open(char)
+        else:
+            self._position += 1
+        return True
+
+    def _parse_link_text(self, final: bool) -> bool:
+        if self.text[self._position] != "]":
+            self._position += 1
+        elif len(self.text) - self._position < len(LINK_URL) and not final:
+            return False
+        elif self.text.startswith(LINK_URL, self._position):
+            self._entity = LINK_URL
+            self._position += len(LINK_URL)
+        else:
+            self._escape_entity()
+        return True
+
+    def _parse_inside_entity(self, final: bool) -> bool:
+        entity = self._entity or ""
+        remaining = len(self.text) - self._position
+        if self.text[self._position] == "`" and remaining < len(entity) and not final:
+            return False
+        if self.text.startswith(entity, self._position):
+            self._position += len(entity)
+            self._entity = None
+        else:
+            self._position += 1
+        return True
+
+    def _get_length(self, start_index: int, end_index: int) -> int:
+        start = self._safe_positions[start_index]
+        end = self._safe_positions[end_index]
+        escapes = bisect.bisect_left(self._escapes, end) - bisect.bisect_left(
+            self._escapes, start
+        )
+        return end - start + escapes
+
+    def _find_cut(self, start_index: int, last_index: int) -> int:
+        """
+        Find where the message starting at the given safe position should end
+        """
+        opener = self._get_opener(self._safe_entities[start_index])
+        # Keep room for the markers added to close and reopen entities
+        budget = self.max_length - len(opener) - len(PRE)
+        closer = self._safe_entities[last_index] or ""
+        if (
+            len(opener) + self._get_length(start_index, last_index) + len(closer)
+            <= self.max_length
+        ):
+            return last_index
+
+        low, high = start_index + 1, last_index
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._get_length(start_index, middle) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        end_index = low
+
+        # Prefer cutting after a line break if there is one in the second half of the message
+        minimum_position = self._safe_positions[start_index] + budget // 2
+        for index in range(end_index, start_index, -1):
+            position = self._safe_positions[index]
+            if position < minimum_position:
+                break
+            if self.text[position - 1] == "\n":
+                return index
+        return end_index
+
+    @staticmethod
+    def _get_opener(entity: str | None) -> str:
+        if entity is None:
+            return ""
+        # Line break to avoid the beginning of the content being used as the language of the block
+        return f"{PRE}\n" if entity == PRE else entity
+
+    def _render_range(self, start_index: int, end_index: int) -> str:
+        start = self._safe_positions[start_index]
+        end = self._safe_positions[end_index]
+        start_entity = self._safe_entities[start_index]
+        end_entity = self._safe_entities[end_index]
+
+        opener = self._get_opener(start_entity)
+        if start_entity is not None and self.text.startswith(start_entity, start):
+            # The entity is closed right away, avoid sending an empty one
+            opener = ""
+            start += len(start_entity)
+
+        parts = [opener]
+        previous = start
+        for escape in self._escapes[
+            bisect.bisect_left(self._escapes, start) : bisect.bisect_left(
+                self._escapes, end
+            )
+        ]:
+            parts.append(self.text[previous:escape])
+            parts.append("\\")
+            previous = escape
+        parts.append(self.text[previous:end])
+        if end_entity is not None:
+            parts.append(end_entity)
+        return "".join(parts)
@@ -0,0 +1,279 @@
+import asyncio
+import contextlib
+import time
+from typing import AsyncGenerator, AsyncIterable
+
+from libertai_agents.agents import ChatAgent
+from libertai_agents.interfaces.messages import Message
+from libertai_agents.interfaces.tools import Tool
+from libertai_agents.models import get_model
+from libertai_agents.models.models import ModelConfiguration
+
+from src.utils.logger import Logger
+
+# Weight given to the latest sample in the latency moving average
+LATENCY_EWMA_ALPHA = 0.3
+
+
+class ModelBackend:
+    """
+    A single model backend the router can send requests to, along with its health and latency stats
+    """
+
+    name: str
+    agent: ChatAgent
+    latency: float | None
+    consecutive_failures: int
+    unhealthy_until: float
+
+    def __init__(self, name: str, agent: ChatAgent):
+        self.name = name
+        self.agent = agent
+        # Moving average of the time to the first response, in seconds
+        self.latency = None
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    def __repr__(self):
+        return f"ModelBackend(name={self.name})"
+
+    @classmethod
+    def from_spec(cls, spec: str, tools: list[Tool]) -> "ModelBackend":
+        """
+        Build a backend from a `model_id` or `model_id@vm_url` specification
+
+        spec: The backend specification. The optional URL overrides the default completion endpoint of the model
+        (useful to point to a local model or a stub server)
+        tools: The tools the agent of this backend can use
+        """
+        model_id, _, vm_url = spec.strip().partition("@")
+        custom_configuration = (
+            ModelConfiguration(vm_url=vm_url, context_length=4096) if vm_url else None
+        )
+        agent = ChatAgent(
+            model=get_model(model_id, custom_configuration=custom_configuration),
+            tools=tools,
+            expose_api=False,
+        )
+        return cls(spec.strip(), agent)
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def _record_latency(self, latency: float):
+        self.latency = (
+            latency
+            if self.latency is None
+            else LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.latency
+        )
+
+    def record_success(self, latency: float):
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self._record_latency(latency)
+
+    def record_no_response(self, elapsed: float):
+        """
+        Record that the backend didn't respond after some time (e.g. when another one won the race).
+        The elapsed time is a lower bound of its latency, so it can only make the estimate worse.
+
+        elapsed: The number of seconds the backend ran without responding
+        """
+        self._record_latency(max(elapsed, self.latency or 0.0))
+
+    def record_failure(self, max_failures: int, cooldown: float):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= max_failures:
+            self.unhealthy_until = time.monotonic() + cooldown
+
+
+# A started backend with its answer stream and the time it was started at
+PendingBackend = tuple[ModelBackend, AsyncGenerator[Message, None], float]
+
+
+class ModelRouter:
+    """
+    Route answer generation across several model backends.
+    Requests are hedged (a second backend is started when the first one is slow to respond, and the fastest one wins)
+    and backends that keep failing are skipped for a while.
+    """
+
+    backends: list[ModelBackend]
+    hedge_delay: float
+    max_failures: int
+    cooldown: float
+    logger: Logger | None
+
+    def __init__(
+        self,
+        backends: list[ModelBackend],
+        hedge_delay: float = 10.0,
+        max_failures: int = 3,
+        cooldown: float = 60.0,
+        logger: Logger | None = None,
+    ):
+        """
+        Initialize a new ModelRouter instance
+        - backends - the backends to use, in order of preference when their latency is unknown or equal
+        - hedge_delay - seconds to wait for a response before starting the next backend
+        - max_failures - number of consecutive failures after which a backend is considered unhealthy
+        - cooldown - seconds during which an unhealthy backend is skipped
+        - logger - where to log failovers. If `None` nothing is logged
+        """
+        if len(backends) == 0:
+            raise ValueError("At least one model backend is required")
+        self.backends = backends
+        self.hedge_delay = hedge_delay
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.logger = logger
+
+    def get_stats(self) -> list[dict]:
+        """
+        Get the health and latency stats of every backend
+        """
+        return [
+            {
+                "name": backend.name,
+                "healthy": backend.healthy,
+                "latency": backend.latency,
+                "consecutive_failures": backend.consecutive_failures,
+            }
+            for backend in self.backends
+        ]
+
+    def get_stats_report(self) -> str:
+        """
+        Get a readable summary of the health and latency stats of every backend
+        """
+        lines = []
+        for stats in self.get_stats():
+            latency = "N/A" if stats["latency"] is None else f"{stats['latency']:.2f}s"
+            lines.append(
+                f"{stats['name']}: {'healthy' if stats['healthy'] else 'unhealthy'}, "
+                f"latency {latency}, {stats['consecutive_failures']} consecutive failures"
+            )
+        return "\n".join(lines)
+
+    def _get_candidates(self) -> list[ModelBackend]:
+        # Healthy backends first, fastest first. Unhealthy ones are kept last as a last resort, and backends without
+        # measurements yet are tried first to get one (the order of preference is kept otherwise as the sort is stable)
+        return sorted(
+            self.backends,
+            key=lambda backend: (not backend.healthy, backend.latency or 0.0),
+        )
+
+    def _start_backend(
+        self,
+        backend: ModelBackend,
+        messages: list[Message],
+        system_prompt: str | None,
+        pending: dict[asyncio.Future, PendingBackend],
+    ):
+        # Each backend gets its own copy as the agent appends tool calls to the list
+        stream = backend.agent.generate_answer(
+            list(messages), system_prompt=system_prompt
+        )
+        task = asyncio.ensure_future(anext(stream, None))
+        pending[task] = (backend, stream, time.monotonic())
+
+    async def _close_backends(self, pending: dict[asyncio.Future, PendingBackend]):
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for backend, stream, started_at in pending.values():
+            # Backends losing the race must not keep looking fast
+            backend.record_no_response(time.monotonic() - started_at)
+            with contextlib.suppress(Exception):
+                await stream.aclose()
+
+    async def _race_backends(
+        self,
+        messages: list[Message],
+        system_prompt: str | None,
+    ) -> tuple[ModelBackend, AsyncGenerator[Message, None], Message | None]:
+        """
+        Start the backends one after the other until one of them responds
+
+        messages: List of messages previously sent in this conversation
+        system_prompt: Optional system prompt to customize the agent's behavior
+        """
+        candidates = self._get_candidates()
+        next_index = 0
+        pending: dict[asyncio.Future, PendingBackend] = {}
+        last_error: Exception | None = None
+
+        try:
+            while len(pending) > 0 or next_index < len(candidates):
+                if len(pending) == 0:
+                    # Nothing running anymore, fail over to the next backend right away
+                    self._start_backend(
+                        candidates[next_index], messages, system_prompt, pending
+                    )
+                    next_index += 1
+
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_delay if next_index < len(candidates) else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if len(done) == 0:
+                    # No response in time, hedge the request on the next backend
+                    if self.logger:
+                        self.logger.warn(
+                            f"ModelRouter::_race_backends(): No response after {self.hedge_delay}s, hedging on {candidates[next_index].name}"
+                        )
+                    self._start_backend(
+                        candidates[next_index], messages, system_prompt, pending
+                    )
+                    next_index += 1
+                    continue
+
+                for task in done:
+                    backend, stream, started_at = pending.pop(task)
+                    try:
+                        first_message = task.result()
+                    except Exception as e:
+                        last_error = e
+                        backend.record_failure(self.max_failures, self.cooldown)
+                        if self.logger:
+                            self.logger.warn(
+                                f"ModelRouter::_race_backends(): Backend {backend.name} failed: {e}"
+                            )
+                        continue
+
+                    # Backends that responded at the same time are still pending and get closed below
+                    backend.record_success(time.monotonic() - started_at)
+                    return backend, stream, first_message
+        finally:
+            await self._close_backends(pending)
+
+        if last_error is not None:
+            raise last_error
+        raise ValueError("No model backend available")
+
+    async def generate_answer(
+        self,
+        messages: list[Message],
+        system_prompt: str | None = None,
+    ) -> AsyncIterable[Message]:
+        """
+        Generate an answer based on a conversation, using the first backend to respond
+
+        messages: List of messages previously sent in this conversation
+        system_prompt: Optional system prompt to customize the agent's behavior
+        """
+        backend, stream, first_message = await self._race_backends(
+            messages, system_prompt
+        )
+        if first_message is None:
+            return
+
+        yield first_message
+        try:
+            async for response_msg in stream:
+                yield response_msg
+        except Exception as e:
+            backend.record_failure(self.max_failures, self.cooldown)
+            raise e
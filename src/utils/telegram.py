@@ -58,3 +58,59 @@ def should_reply_to_message(message: Message) -> bool:
             # Message is mentioning the bot
             return True
     return False
+
+
+async def edit_rendered_replies(
+    message: Message,
+    replies: list[Message],
+    replies_text: list[str],
+    rendered_messages: list[str],
+):
+    """
+    Update the replies to a message with the rendered parts of an answer.
+    Only the replies whose text changed are edited, and new replies are sent when the answer needs more messages.
+
+    message: The message being answered
+    replies: The replies already sent, updated in place
+    replies_text: The text last sent in each reply, updated in place
+    rendered_messages: The rendered parts of the answer
+    """
+    # Telegram rejects empty messages
+    parts = [part for part in rendered_messages if part.strip() != ""]
+    for i, part in enumerate(parts):
+        if i >= len(replies):
+            replies.append(await config.BOT.reply_to(message, part))
+            replies_text.append(part)
+        elif replies_text[i] != part:
+            edited_reply = await config.BOT.edit_message_text(
+                chat_id=message.chat.id, message_id=replies[i].message_id, text=part
+            )
+            # Telegram only returns True when editing an inline message
+            if isinstance(edited_reply, Message):
+                replies[i] = edited_reply
+            replies_text[i] = part
+
+
+async def replace_replies_with_error(
+    message: Message, replies: list[Message], error_text: str
+):
+    """
+    Replace the replies to a message with an error, keeping only the first reply to show it
+
+    message: The message being answered
+    replies: The replies already sent, updated in place
+    error_text: The error to show
+    """
+    if len(replies) == 0:
+        return
+
+    # Remove the follow-up replies of the partial answer
+    for follow_up in replies[1:]:
+        await config.BOT.delete_message(message.chat.id, follow_up.message_id)
+    del replies[1:]
+
+    edited_reply = await config.BOT.edit_message_text(
+        chat_id=message.chat.id, message_id=replies[0].message_id, text=error_text
+    )
+    if isinstance(edited_reply, Message):
+        replies[0] = edited_reply
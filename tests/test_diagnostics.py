@@ -0,0 +1,129 @@
+import asyncio
+import gc
+import re
+import time
+
+import pytest
+
+from src.utils.diagnostics import (
+    DEFAULT_PROFILE_DURATION,
+    Diagnostics,
+    parse_profile_duration,
+)
+
+THRESHOLD = 0.05
+
+
+class StubLogger:
+    """
+    Keep the logged warnings instead of writing them
+    """
+
+    def __init__(self):
+        self.warnings: list[str] = []
+
+    def warn(self, message: str, *args, **kwargs):
+        self.warnings.append(message)
+
+
+def block_event_loop(duration: float):
+    time.sleep(duration)
+
+
+@pytest.mark.parametrize(
+    "args, expected",
+    [
+        ([], DEFAULT_PROFILE_DURATION),
+        (["0.5"], 0.5),
+        (["60"], 60.0),
+        (["0"], None),
+        (["-1"], None),
+        (["60.1"], None),
+        (["nan"], None),
+        (["inf"], None),
+        (["1e309"], None),
+        (["abc"], None),
+    ],
+)
+def test_parse_profile_duration(args: list[str], expected: float | None):
+    assert parse_profile_duration(args) == expected
+
+
+@pytest.mark.parametrize("threshold", [0, -1, float("nan")])
+def test_invalid_threshold_is_rejected(threshold: float):
+    with pytest.raises(ValueError):
+        Diagnostics(StubLogger(), slow_callback_threshold=threshold)  # type: ignore
+
+
+def test_blocked_event_loop_is_logged():
+    logger = StubLogger()
+
+    async def run():
+        diagnostics = Diagnostics(logger, slow_callback_threshold=THRESHOLD)  # type: ignore
+        diagnostics.start()
+        try:
+            await asyncio.sleep(THRESHOLD)
+            block_event_loop(3 * THRESHOLD)
+            # Let the watchdog notice that the event loop is running again
+            await asyncio.sleep(3 * THRESHOLD)
+        finally:
+            diagnostics.stop()
+
+    asyncio.run(run())
+    stalls = [message for message in logger.warnings if "current stack" in message]
+    # The stack points to the code blocking the event loop
+    assert any("block_event_loop" in message for message in stalls)
+    assert any("event loop was blocked for" in message for message in logger.warnings)
+
+
+def test_gc_report():
+    async def run():
+        diagnostics = Diagnostics(StubLogger())  # type: ignore
+        diagnostics.start()
+        try:
+            gc.collect()
+            return diagnostics.get_gc_report()
+        finally:
+            diagnostics.stop()
+
+    assert re.search(r"^Generation 2: \d+ collections", asyncio.run(run()), re.M)
+
+
+def test_memory_report():
+    async def run():
+        diagnostics = Diagnostics(StubLogger())  # type: ignore
+        try:
+            assert (await diagnostics.get_memory_report()).startswith(
+                "Memory tracing started"
+            )
+            allocations = [str(i) * 100 for i in range(1000)]
+            report = await diagnostics.get_memory_report(limit=5)
+            assert "Top 5 allocations:" in report
+            assert "growths" not in report
+            del allocations
+            # The growth since the previous report is only available from the second one
+            assert "Top 5 growths" in await diagnostics.get_memory_report(limit=5)
+        finally:
+            diagnostics.stop_memory_tracing()
+
+    asyncio.run(run())
+
+
+def test_profile_report():
+    async def run():
+        diagnostics = Diagnostics(StubLogger())  # type: ignore
+        diagnostics.start()
+        try:
+            profile = asyncio.create_task(diagnostics.get_profile_report(0.2))
+            await asyncio.sleep(0)
+            assert (
+                await diagnostics.get_profile_report(0.2)
+                == "A profile is already running"
+            )
+            report = await profile
+            assert "samples over 0.2s" in report
+            assert "Top self time:" in report
+        finally:
+            diagnostics.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,150 @@
+import asyncio
+import datetime
+import gzip
+import json
+
+from src.history import export_history, import_history
+from src.utils.database import AsyncDatabase
+from src.utils.logger import Logger
+
+START = datetime.datetime(2024, 1, 1)
+MESSAGES_COUNT = 25
+# Smaller than the number of messages to get several pages
+BATCH_SIZE = 4
+
+USERS = [
+    {
+        "id": 1,
+        "username": "alice",
+        "first_name": "Alice",
+        "last_name": None,
+        "language_code": "en",
+    },
+    {
+        "id": 2,
+        "username": None,
+        "first_name": "Bob",
+        "last_name": "Smith",
+        "language_code": "fr",
+    },
+]
+# Author of some messages without a row in the users table
+MISSING_USER_ID = 3
+
+
+def get_message(message_id: int) -> dict:
+    return {
+        "id": message_id,
+        "chat_id": 100 + message_id % 3,
+        "from_user_id": message_id % 3 + 1,
+        "reply_to_message_id": message_id - 1 if message_id % 2 == 0 else None,
+        "text": f"Message {message_id}",
+        "timestamp": START + datetime.timedelta(hours=message_id),
+    }
+
+
+def create_database(path: str) -> AsyncDatabase:
+    database = AsyncDatabase(path)
+    asyncio.run(
+        database.add_messages_batch(
+            USERS, [get_message(i) for i in range(1, MESSAGES_COUNT + 1)]
+        )
+    )
+    return database
+
+
+async def get_ids(database: AsyncDatabase, **filters) -> list[int]:
+    ids = []
+    async for rows in database.get_messages_batches(BATCH_SIZE, **filters):
+        assert 0 < len(rows) <= BATCH_SIZE
+        ids += [row["id"] for row in rows]
+    return ids
+
+
+def test_batches_have_no_gap_or_duplicate(tmp_path):
+    database = create_database(str(tmp_path / "source.db"))
+    ids = asyncio.run(get_ids(database))
+    assert ids == list(range(1, MESSAGES_COUNT + 1))
+
+
+def test_batches_filters(tmp_path):
+    database = create_database(str(tmp_path / "source.db"))
+
+    async def run():
+        assert await get_ids(database, chat_ids=[100]) == list(
+            range(3, MESSAGES_COUNT + 1, 3)
+        )
+        assert await get_ids(database, chat_ids=[100, 101]) == [
+            i for i in range(1, MESSAGES_COUNT + 1) if i % 3 != 2
+        ]
+        # since is inclusive and until exclusive
+        assert await get_ids(
+            database,
+            since=START + datetime.timedelta(hours=5),
+            until=START + datetime.timedelta(hours=15),
+        ) == list(range(5, 15))
+        assert await get_ids(database, since=START + datetime.timedelta(days=30)) == []
+
+    asyncio.run(run())
+
+
+def test_export_import_round_trip(tmp_path):
+    source = create_database(str(tmp_path / "source.db"))
+    destination = AsyncDatabase(str(tmp_path / "destination.db"))
+    export_path = str(tmp_path / "history.jsonl.gz")
+    logger = Logger()
+
+    # Keep the number of messages inserted by each batch
+    inserted: list[int] = []
+    add_messages_batch = destination.add_messages_batch
+
+    async def add_messages_batch_spy(users: list[dict], messages: list[dict]) -> int:
+        count = await add_messages_batch(users, messages)
+        inserted.append(count)
+        return count
+
+    destination.add_messages_batch = add_messages_batch_spy  # type: ignore
+
+    async def run():
+        await export_history(source, export_path, BATCH_SIZE, None, None, None, logger)
+        with gzip.open(export_path, "rt", encoding="utf-8") as export_file:
+            lines = [json.loads(line) for line in export_file]
+        assert [line["id"] for line in lines] == list(range(1, MESSAGES_COUNT + 1))
+
+        # The author id is kept even without a user row
+        orphan = lines[1]
+        assert orphan["from_user_id"] == MISSING_USER_ID
+        assert orphan["from_user"] is None
+        assert lines[0]["from_user"] == USERS[1]
+        assert lines[2]["from_user"] == USERS[0]
+
+        await import_history(destination, export_path, BATCH_SIZE, logger)
+        assert sum(inserted) == MESSAGES_COUNT
+        assert [
+            row async for rows in destination.get_messages_batches() for row in rows
+        ] == [row async for rows in source.get_messages_batches() for row in rows]
+
+        # Importing again skips all the messages already present
+        inserted.clear()
+        await import_history(destination, export_path, BATCH_SIZE, logger)
+        assert len(inserted) > 1 and sum(inserted) == 0
+        assert await get_ids(destination) == list(range(1, MESSAGES_COUNT + 1))
+
+    asyncio.run(run())
+
+
+def test_add_messages_batch_counts_inserted_rows(tmp_path):
+    database = AsyncDatabase(str(tmp_path / "destination.db"))
+    messages = [get_message(i) for i in range(1, 11)]
+
+    async def run():
+        assert await database.add_messages_batch(USERS, messages[:6]) == 6
+        # Only the messages not already present are counted
+        assert await database.add_messages_batch(USERS, messages) == 4
+        assert await database.add_messages_batch(USERS, messages) == 0
+        # Messages whose author is missing from the users table are imported too
+        orphan = get_message(MESSAGES_COUNT + 1)
+        assert orphan["from_user_id"] == MISSING_USER_ID
+        assert await database.add_messages_batch([], [orphan]) == 1
+
+    asyncio.run(run())
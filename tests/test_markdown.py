@@ -0,0 +1,160 @@
+from hypothesis import assume, given
+from hypothesis import strategies as st
+
+from src.utils.markdown import ESCAPABLE_CHARACTERS, MarkdownRenderer
+
+# Pieces of text likely to produce Markdown entities (and broken ones)
+markdown_text = st.lists(
+    st.sampled_from(
+        ["a", "b", " ", "\n", "*", "_", "`", "```", "[", "]", "(", ")", "\\", "[x](y)"]
+    ),
+    max_size=80,
+).map("".join)
+
+
+def _parse_outside_entity(text: str, position: int) -> tuple[int, str, str | None]:
+    char = text[position]
+    if char == "\\" and text[position + 1 : position + 2] in list(ESCAPABLE_CHARACTERS):
+        return position + 2, text[position + 1], None
+    if text.startswith("```", position):
+        # The line break after the opening marker of a block isn't displayed
+        return position + (4 if text.startswith("\n", position + 3) else 3), "", "```"
+    if char in "*_`[":
+        return position + 1, "", char
+    return position + 1, char, None
+
+
+def parse_markdown(text: str) -> tuple[str, int] | None:
+    """
+    Parse a text like Telegram's legacy Markdown parse mode, returning the text visible to users and the length of the
+    longest link, or None if some entities aren't closed
+    """
+    visible: list[str] = []
+    longest_link = 0
+    position = 0
+    entity: str | None = None
+    entity_start = 0
+    while position < len(text):
+        if entity is None:
+            entity_start = position
+            position, char, entity = _parse_outside_entity(text, position)
+            visible.append(char)
+        elif entity == "[" and text[position] == "]":
+            if not text.startswith("](", position):
+                return None
+            entity = "]("
+            position += 2
+        elif entity in ("[", "]("):
+            if entity == "[":
+                visible.append(text[position])
+            elif text[position] == ")":
+                entity = None
+                longest_link = max(longest_link, position + 1 - entity_start)
+            position += 1
+        elif text.startswith(entity, position):
+            position += len(entity)
+            entity = None
+        else:
+            visible.append(text[position])
+            position += 1
+    if entity is not None:
+        return None
+    return "".join(visible), longest_link
+
+
+def render_in_chunks(text: str, sizes: list[int], max_length: int) -> list[list[str]]:
+    renderer = MarkdownRenderer(max_length)
+    renders = []
+    position = 0
+    for size in sizes:
+        if position >= len(text):
+            break
+        renderer.feed(text[position : position + size])
+        position += size
+        renders.append(renderer.render())
+    renderer.feed(text[position:])
+    renderer.finish()
+    renders.append(renderer.render())
+    return renders
+
+
+@given(
+    text=markdown_text,
+    sizes=st.lists(st.integers(min_value=1, max_value=10), max_size=40),
+    max_length=st.sampled_from([20, 32, 64, 4096]),
+)
+def test_chunked_rendering(text: str, sizes: list[int], max_length: int):
+    renders = render_in_chunks(text, sizes, max_length)
+
+    one_shot = MarkdownRenderer(max_length)
+    one_shot.feed(text)
+    one_shot.finish()
+    assert renders[-1] == one_shot.render()
+
+    for messages in renders:
+        for message in messages:
+            assert parse_markdown(message) is not None, message
+            assert len(message) <= max_length, message
+
+
+@given(text=markdown_text, max_length=st.sampled_from([20, 32, 64]))
+def test_split_rendering_preserves_content(text: str, max_length: int):
+    renderer = MarkdownRenderer(max_length)
+    renderer.feed(text)
+    renderer.finish()
+    parsed_messages = [parse_markdown(message) for message in renderer.render()]
+
+    unsplit = MarkdownRenderer(len(text) * 2 + 10)
+    unsplit.feed(text)
+    unsplit.finish()
+    parsed_unsplit = parse_markdown("".join(unsplit.render()))
+    assert parsed_unsplit is not None
+    visible, longest_link = parsed_unsplit
+    # Links too long to fit in a message are sent as regular text when splitting
+    assume(longest_link <= max_length // 2)
+
+    assert all(parsed is not None for parsed in parsed_messages)
+    assert "".join(parsed[0] for parsed in parsed_messages if parsed) == visible
+
+
+def test_partial_entities_are_closed():
+    renderer = MarkdownRenderer()
+    renderer.feed("Some *bold")
+    assert renderer.render() == ["Some *bold*"]
+    renderer.feed("* and `code")
+    assert renderer.render() == ["Some *bold* and `code`"]
+
+
+def test_unfinished_link_is_held_back():
+    renderer = MarkdownRenderer()
+    renderer.feed("see [note](http://exa")
+    assert renderer.render() == ["see "]
+    renderer.feed("mple.com)")
+    assert renderer.render() == ["see [note](http://example.com)"]
+
+
+def test_unclosed_markers_are_escaped_when_finished():
+    renderer = MarkdownRenderer()
+    renderer.feed("2 * 3 = 6 and snake_case")
+    renderer.finish()
+    assert renderer.render() == ["2 \\* 3 = 6 and snake\\_case"]
+
+
+def test_long_answer_is_split():
+    renderer = MarkdownRenderer()
+    renderer.feed("*" + "word " * 1000 + "*")
+    renderer.finish()
+    messages = renderer.render()
+    assert len(messages) == 2
+    assert all(len(message) <= 4096 for message in messages)
+    assert messages[0].startswith("*") and messages[0].endswith("*")
+    assert messages[1].startswith("*") and messages[1].endswith("*")
+
+
+def test_too_long_link_is_sent_as_text():
+    renderer = MarkdownRenderer()
+    renderer.feed("[t](" + "h" * 5000 + ")")
+    renderer.finish()
+    messages = renderer.render()
+    assert messages[0].startswith("\\[t]")
+    assert all(len(message) <= 4096 for message in messages)
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+from libertai_agents.agents import ChatAgent
+from libertai_agents.interfaces.messages import Message, MessageRoleEnum
+
+from src.utils.router import ModelBackend, ModelRouter
+
+MESSAGES = [Message(role=MessageRoleEnum.user, content="Hello")]
+
+
+class StubModel:
+    """
+    Minimal model calling a local completion endpoint, without loading a tokenizer
+    """
+
+    def __init__(self, vm_url: str):
+        self.model_id = "stub"
+        self.vm_url = vm_url
+
+    def generate_prompt(self, messages, tools, system_prompt=None) -> str:
+        return "\n".join(message.content for message in messages)
+
+    @staticmethod
+    def extract_tool_calls_from_response(response: str) -> list:
+        return []
+
+
+@asynccontextmanager
+async def stub_server(content: str, delay: float = 0.0, status: int = 200):
+    """
+    Run a local completion server answering after a delay
+    """
+
+    async def completion(_request: web.Request) -> web.Response:
+        await asyncio.sleep(delay)
+        return web.json_response({"content": content}, status=status)
+
+    app = web.Application()
+    app.router.add_post("/completion", completion)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    _host, port = runner.addresses[0]
+    try:
+        yield ModelBackend(
+            content,
+            ChatAgent(
+                model=StubModel(f"http://127.0.0.1:{port}/completion"),  # type: ignore
+                expose_api=False,
+            ),
+        )
+    finally:
+        await runner.cleanup()
+
+
+async def get_answer(router: ModelRouter) -> list[str]:
+    return [message.content async for message in router.generate_answer(MESSAGES)]
+
+
+def test_hedged_request_uses_fastest_backend():
+    async def run():
+        async with (
+            stub_server("slow", delay=1.0) as slow,
+            stub_server("fast") as fast,
+        ):
+            router = ModelRouter([slow, fast], hedge_delay=0.1)
+            started_at = time.monotonic()
+            assert await get_answer(router) == ["fast"]
+            assert time.monotonic() - started_at < 0.5
+
+            # The slow backend lost the race, so it's now tried after the fast one
+            assert slow.latency is not None and slow.latency >= 0.1
+            assert fast.latency is not None and fast.latency < slow.latency
+            assert router._get_candidates() == [fast, slow]
+            assert "slow: healthy" in router.get_stats_report()
+
+    asyncio.run(run())
+
+
+def test_failover_on_error():
+    async def run():
+        async with (
+            stub_server("broken", status=500) as broken,
+            stub_server("working") as working,
+        ):
+            router = ModelRouter([broken, working], hedge_delay=10)
+            started_at = time.monotonic()
+            assert await get_answer(router) == ["working"]
+            # No need to wait for the hedge delay when a backend fails
+            assert time.monotonic() - started_at < 1
+            assert broken.consecutive_failures == 1
+            assert working.consecutive_failures == 0
+
+    asyncio.run(run())
+
+
+def test_unhealthy_backend_cooldown():
+    async def run():
+        async with (
+            stub_server("broken", status=500) as broken,
+            stub_server("working") as working,
+        ):
+            router = ModelRouter(
+                [broken, working], hedge_delay=10, max_failures=2, cooldown=0.2
+            )
+            await get_answer(router)
+            assert broken.healthy
+            await get_answer(router)
+            assert not broken.healthy
+            assert router._get_candidates() == [working, broken]
+
+            await asyncio.sleep(0.2)
+            assert broken.healthy
+
+    asyncio.run(run())
+
+
+def test_all_backends_failing_raises():
+    async def run():
+        async with (
+            stub_server("first", status=500) as first,
+            stub_server("second", status=500) as second,
+        ):
+            router = ModelRouter([first, second], hedge_delay=10)
+            with pytest.raises(ValueError):
+                await get_answer(router)
+            assert first.consecutive_failures == 1
+            assert second.consecutive_failures == 1
+
+    asyncio.run(run())
+
+
+def test_losing_backend_is_cancelled():
+    closed: list[str] = []
+
+    class StubAgent:
+        def __init__(self, name: str, delay: float):
+            self.name = name
+            self.delay = delay
+
+        async def generate_answer(self, messages, system_prompt=None):
+            try:
+                await asyncio.sleep(self.delay)
+                yield Message(role=MessageRoleEnum.assistant, content=self.name)
+            finally:
+                closed.append(self.name)
+
+    async def run():
+        slow = ModelBackend("slow", StubAgent("slow", 10))  # type: ignore
+        fast = ModelBackend("fast", StubAgent("fast", 0))  # type: ignore
+        router = ModelRouter([slow, fast], hedge_delay=0.05)
+        assert await get_answer(router) == ["fast"]
+        assert sorted(closed) == ["fast", "slow"]
+
+    asyncio.run(run())